@@ -16,15 +16,23 @@ Date: January 2026
 
 import streamlit as st
 from openai import OpenAI
+import concurrent.futures
+import hashlib
+import heapq
+import json
 import os
 from dotenv import load_dotenv
 import requests
+from collections import Counter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import re
+import tiktoken
 from fpdf import FPDF
 from urllib.parse import urljoin, urlparse
 import time
-from typing import Tuple, List, Optional
+from typing import Iterator, Tuple, List, Optional
 
 # ============================================================================
 # CONFIGURATION & SETUP
@@ -42,9 +50,64 @@ st.set_page_config(
 # Configuration constants
 MAX_RETRIES = 3
 REQUEST_TIMEOUT = 10
-SCRAPE_DELAY = 1  # Seconds between requests (be respectful to servers)
 MAX_TEXT_PER_PAGE = 5000  # Increased from 3000
+MAX_BYTES_PER_PAGE = MAX_TEXT_PER_PAGE * 8  # HTML overhead headroom over extracted text
+MAX_RESPONSE_BYTES = 2_000_000  # Skip anything advertising a bigger body
 MAX_TOTAL_TEXT = 20000  # Increased from 12000
+MAX_INPUT_TOKENS = 6000  # Token-exact budget for model input
+ANALYSIS_CACHE_TTL = 3600  # Seconds to reuse a report for identical content
+REPORT_CACHE_MAX_ENTRIES = 32  # Cap on stored reports (matches create_pdf)
+
+# Default request headers, built once and applied to the shared session.
+# Advertising br lets servers send Brotli, typically 15-25% smaller HTML
+# bodies than gzip (decoded transparently by urllib3 via the brotli pkg).
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+}
+
+# Tokenizer for gpt-4o-mini, loaded once (encoding_for_model is slow)
+_ENCODING = tiktoken.encoding_for_model("gpt-4o-mini")
+
+# Shared session: pooling, retries and default headers are configured
+# once here and reused by every fetch
+SESSION = requests.Session()
+SESSION.headers.update(_HEADERS)
+
+# Pool and reuse connections (saves a TLS handshake per page on the same
+# host) and let urllib3 handle retries with exponential backoff
+_ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=MAX_RETRIES,
+        backoff_factor=1,
+        status_forcelist=[502, 503, 504],
+    ),
+)
+SESSION.mount('https://', _ADAPTER)
+SESSION.mount('http://', _ADAPTER)
+
+
+# Pages worth scraping for company understanding; compiled once so
+# find_all can filter hrefs in C instead of a per-link Python check
+_LINK_KEYWORDS = ['blog', 'about', 'mission', 'product', 'team', 'careers', 'pricing', 'features']
+_LINK_KEYWORD_RE = re.compile('|'.join(_LINK_KEYWORDS), re.IGNORECASE)
+
+# Precompiled patterns - compiled once instead of a re-cache lookup on
+# every scrape / PDF export
+_MD_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_MD_HEADER_RE = re.compile(r'#+\s?')
+_MD_LINK_RE = re.compile(r'\[(.*?)\]\(.*?\)')
+
+# Smart punctuation -> ASCII, applied in a single C-level pass
+_PDF_CHAR_TABLE = str.maketrans({
+    0x2018: "'", 0x2019: "'",   # Smart single quotes
+    0x201c: '"', 0x201d: '"',   # Smart double quotes
+    0x2013: '-', 0x2014: '--',  # En/em dashes
+    0x2026: '...',              # Ellipsis
+})
 
 # ============================================================================
 # WEB SCRAPING FUNCTIONS
@@ -65,73 +128,92 @@ def get_important_links(base_url: str, soup: BeautifulSoup) -> List[str]:
         List of URLs to scrape (max 5 for efficiency)
     """
     links = set()
-    keywords = ['blog', 'about', 'mission', 'product', 'team', 'careers', 'pricing', 'features']
     domain = urlparse(base_url).netloc
-    
-    for a in soup.find_all('a', href=True):
+
+    # The href regex prefilters to keyword-matching links before we pay
+    # for urljoin/urlparse in Python
+    for a in soup.find_all('a', href=_LINK_KEYWORD_RE):
         full_url = urljoin(base_url, a['href'])
-        
+
         # Only include links from same domain
         if urlparse(full_url).netloc == domain:
-            # Check if any keyword is in the URL
-            if any(k in full_url.lower() for k in keywords):
-                links.add(full_url)
-    
-    # Return top 5 links (prioritize 'about' and 'blog')
-    sorted_links = sorted(links, key=lambda x: (
-        'about' in x.lower(),
-        'blog' in x.lower(),
-        'product' in x.lower()
-    ), reverse=True)
+            links.add(full_url)
     
-    return sorted_links[:5]
+    # Return top 5 links (prioritize 'about' and 'blog'); nlargest is
+    # O(n log 5) vs a full sort, and the key lowercases each URL once
+    def priority(link: str) -> Tuple[bool, bool, bool]:
+        lowered = link.lower()
+        return ('about' in lowered, 'blog' in lowered, 'product' in lowered)
 
+    return heapq.nlargest(5, links, key=priority)
 
-def scrape_page(url: str, retry_count: int = 0) -> Tuple[str, Optional[BeautifulSoup]]:
+
+def scrape_page(url: str) -> Tuple[str, Optional[BeautifulSoup]]:
     """
     Scrapes text content from a URL with retry logic and error handling.
-    
+
+    Retries (with exponential backoff) happen inside the shared SESSION's
+    adapter, so a single get() call covers the whole retry budget.
+
     Args:
         url: The webpage URL to scrape
-        retry_count: Current retry attempt (for recursive retries)
-        
+
     Returns:
         Tuple of (extracted_text, soup_object)
         Returns ("", None) if scraping fails after all retries
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        }
-        
-        res = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        
+        res = SESSION.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+
         # Check if request was successful
         if res.status_code == 200:
-            soup = BeautifulSoup(res.text, 'html.parser')
+            # Careers/pricing links sometimes resolve to PDFs, images or
+            # JSON - don't feed those to an HTML parser
+            if 'html' not in res.headers.get('Content-Type', ''):
+                res.close()
+                return "", None
+            if int(res.headers.get('Content-Length') or 0) > MAX_RESPONSE_BYTES:
+                res.close()
+                return "", None
+
+            # Read at most MAX_BYTES_PER_PAGE so a multi-MB page can't
+            # stall the pipeline or balloon memory - this also covers
+            # chunked responses that omit Content-Length
+            received = []
+            size = 0
+            for chunk in res.iter_content(chunk_size=8192):
+                received.append(chunk)
+                size += len(chunk)
+                if size >= MAX_BYTES_PER_PAGE:
+                    break
+            res.close()
+            raw = b''.join(received)
+
+            soup = BeautifulSoup(raw, 'lxml')
             
-            # Remove script and style elements (they're not useful content)
-            for script in soup(["script", "style", "nav", "footer"]):
-                script.decompose()
+            # Remove non-content elements in a single tree walk (the
+            # tag-list form iterates the tree once per tag name). header
+            # and aside stay: the caller mines the returned soup for
+            # links, and on many sites the primary nav lives in <header>
+            for tag in soup.select('script, style, nav, footer, noscript, svg, iframe'):
+                tag.decompose()
             
             # Extract text with better formatting
             text = soup.get_text(separator=" ", strip=True)
             
-            # Clean up excessive whitespace
-            text = re.sub(r'\s+', ' ', text)
+            # Clean up excessive whitespace (split/join is a single C-level
+            # pass, much cheaper than a regex over the whole page)
+            text = " ".join(text.split())
             
-            # Limit text length but try to end at sentence boundary
+            # Coarse per-page cap; the token-exact budget is applied
+            # globally before analysis
             if len(text) > MAX_TEXT_PER_PAGE:
                 text = text[:MAX_TEXT_PER_PAGE]
-                # Try to cut at last period
-                last_period = text.rfind('.')
-                if last_period > MAX_TEXT_PER_PAGE * 0.8:  # If we find a period in last 20%
-                    text = text[:last_period + 1]
-            
+
             return text, soup
             
-        elif res.status_code == 403:
+        res.close()
+        if res.status_code == 403:
             return f"[Access denied to {url}]", None
         elif res.status_code == 404:
             return f"[Page not found: {url}]", None
@@ -139,11 +221,8 @@ def scrape_page(url: str, retry_count: int = 0) -> Tuple[str, Optional[Beautiful
             return f"[Error {res.status_code} accessing {url}]", None
             
     except requests.Timeout:
-        if retry_count < MAX_RETRIES:
-            time.sleep(2 ** retry_count)  # Exponential backoff
-            return scrape_page(url, retry_count + 1)
         return f"[Timeout accessing {url}]", None
-        
+
     except requests.ConnectionError:
         return f"[Connection failed to {url}]", None
         
@@ -151,6 +230,40 @@ def scrape_page(url: str, retry_count: int = 0) -> Tuple[str, Optional[Beautiful
         return f"[Unexpected error scraping {url}: {str(e)[:100]}]", None
 
 
+def scrape_links(links: List[str], on_progress=None) -> List[Tuple[str, str]]:
+    """
+    Fetches several pages concurrently through the shared session.
+
+    The pooled SESSION keeps one connection per host alive across the
+    batch, so concurrent sub-page fetches reuse the TLS handshake instead
+    of reconnecting.
+
+    Args:
+        links: URLs to scrape
+        on_progress: Optional callback invoked with (done_count, link) as
+            each page finishes
+
+    Returns:
+        List of (link, text) tuples for pages that yielded content, in
+        completion order
+    """
+    results = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(links)) as executor:
+        futures = {executor.submit(scrape_page, link): link for link in links}
+
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            link = futures[future]
+            if on_progress:
+                on_progress(done, link)
+
+            text, _ = future.result()
+            if text and not text.startswith('['):
+                results.append((link, text))
+
+    return results
+
+
 # ============================================================================
 # PDF GENERATION FUNCTIONS
 # ============================================================================
@@ -166,28 +279,24 @@ def clean_text_for_pdf(text: str) -> str:
         Cleaned text safe for PDF encoding
     """
     # Remove markdown formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Bold
-    text = re.sub(r'#+\s?', '', text)  # Headers
-    text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text)  # Links
+    text = _MD_BOLD_RE.sub(r'\1', text)  # Bold
+    text = _MD_HEADER_RE.sub('', text)  # Headers
+    text = _MD_LINK_RE.sub(r'\1', text)  # Links
     
-    # Replace smart quotes and special characters
-    replacements = {
-        '\u2018': "'", '\u2019': "'",  # Smart single quotes
-        '\u201c': '"', '\u201d': '"',  # Smart double quotes
-        '\u2013': '-', '\u2014': '--',  # En/em dashes
-        '\u2026': '...',  # Ellipsis
-    }
-    for k, v in replacements.items():
-        text = text.replace(k, v)
-    
-    # Encode to latin-1 (PDF-safe), replacing problematic characters
+    # Replace smart quotes in one pass, then encode to latin-1 (PDF-safe),
+    # replacing problematic characters
+    text = text.translate(_PDF_CHAR_TABLE)
     return text.encode('latin-1', 'replace').decode('latin-1')
 
 
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_pdf(text: str, url: str) -> bytes:
     """
     Creates a professional PDF report from analysis text.
-    
+
+    Cached so widget interactions (which rerun the whole script) don't
+    regenerate identical PDF bytes.
+
     Args:
         text: The analysis report text
         url: The company URL analyzed
@@ -196,48 +305,191 @@ def create_pdf(text: str, url: str) -> bytes:
         PDF file as bytes
     """
     pdf = FPDF()
+    pdf.set_compression(True)  # zlib content streams - roughly half the bytes
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
-    
+
     # Title
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "Internship Opportunity Analysis", ln=True, align='L')
-    
+    pdf.set_font("helvetica", 'B', 16)
+    pdf.cell(0, 10, "Internship Opportunity Analysis", new_x="LMARGIN", new_y="NEXT", align='L')
+
     # Company URL
-    pdf.set_font("Arial", 'I', 10)
-    pdf.cell(0, 10, f"Target: {url}", ln=True, align='L')
-    
+    pdf.set_font("helvetica", 'I', 10)
+    pdf.cell(0, 10, f"Target: {url}", new_x="LMARGIN", new_y="NEXT", align='L')
+
     # Date
     from datetime import datetime
-    pdf.cell(0, 10, f"Generated: {datetime.now().strftime('%B %d, %Y')}", ln=True, align='L')
-    
+    pdf.cell(0, 10, f"Generated: {datetime.now().strftime('%B %d, %Y')}", new_x="LMARGIN", new_y="NEXT", align='L')
+
     pdf.ln(10)
-    
-    # Main content
-    pdf.set_font("Arial", size=11)
+
+    # Main content - write() flows text with a much tighter line-break
+    # loop than per-line multi_cell layout
+    pdf.set_font("helvetica", size=11)
     safe_text = clean_text_for_pdf(text)
-    pdf.multi_cell(0, 7, safe_text)
+    pdf.write(7, safe_text)
     
-    return pdf.output(dest='S').encode('latin-1', 'replace')
+    # fpdf2 emits bytes directly - no intermediate str to re-encode
+    return bytes(pdf.output())
 
 
 # ============================================================================
 # AI ANALYSIS FUNCTION
 # ============================================================================
 
-def analyze_company(combined_text: str) -> str:
+def dedupe_pages(pages: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
     """
-    Sends scraped company data to OpenAI for analysis.
-    
+    Drops boilerplate sentences that repeat across scraped pages.
+
+    Company sites show the same nav, CTA, and footer text on every
+    subpage; sending those duplicates to the model wastes input tokens.
+    Any sentence appearing on two or more pages is removed everywhere.
+
     Args:
-        combined_text: All scraped text from company website
-        
+        pages: List of (label, text) tuples
+
     Returns:
-        AI-generated analysis report
-        
+        Pages with cross-page duplicate sentences removed
+    """
+    if len(pages) < 2:
+        return pages
+
+    seen_counts = Counter()
+    for _, text in pages:
+        seen_counts.update(set(text.split('. ')))
+
+    return [
+        (label, '. '.join(s for s in text.split('. ') if seen_counts[s] < 2))
+        for label, text in pages
+    ]
+
+
+def truncate_to_token_budget(pages: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Trims pages so their combined length fits MAX_INPUT_TOKENS exactly.
+
+    Character caps are a rough proxy for tokens (code-heavy pages can run
+    8000+ tokens within the same char budget); counting with tiktoken
+    gives predictable cost per analysis.
+
+    Args:
+        pages: List of (label, text) tuples
+
+    Returns:
+        Pages truncated at a token boundary, later pages dropped once the
+        budget is spent
+    """
+    kept = []
+    remaining = MAX_INPUT_TOKENS
+
+    for label, text in pages:
+        if remaining <= 0:
+            break
+        ids = _ENCODING.encode(text)
+        if len(ids) > remaining:
+            text = _ENCODING.decode(ids[:remaining])
+        kept.append((label, text))
+        remaining -= min(len(ids), remaining)
+
+    return kept
+
+
+@st.cache_data(ttl=ANALYSIS_CACHE_TTL, show_spinner=False)
+def summarize_pages(pages: List[Tuple[str, str]]) -> List[str]:
+    """
+    Compresses scraped pages into short summaries with one batched request.
+
+    Raw page dumps are mostly boilerplate; summarizing first means the
+    expensive analysis call only sees ~150 words per page, which cuts
+    input tokens and latency without losing the signal.
+
+    Args:
+        pages: List of (label, text) tuples, one per scraped page
+
+    Returns:
+        List of summaries in page order (falls back to truncated raw text
+        if the response can't be parsed)
+    """
+    payload = json.dumps([
+        {"id": i, "source": label, "text": text}
+        for i, (label, text) in enumerate(pages)
+    ])
+
+    prompt = f"""
+For each page in the JSON array below, write a ~150-word extractive summary.
+Focus on: what the company does, product features, tech stack hints,
+hiring signals, and anything that looks manual or missing.
+
+Respond with a JSON object: {{"summaries": [{{"id": <page id>, "summary": "..."}}]}}
+
+PAGES:
+{payload}
+"""
+
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        response_format={"type": "json_object"},
+    )
+
+    try:
+        data = json.loads(response.choices[0].message.content)
+        by_id = {item["id"]: item["summary"] for item in data["summaries"]}
+        return [by_id.get(i, text[:500]) for i, (_, text) in enumerate(pages)]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        # Malformed response - fall back to raw text so analysis still runs
+        return [text[:1000] for _, text in pages]
+
+
+@st.cache_resource(show_spinner=False)
+def _report_cache() -> dict:
+    """Cross-rerun store for finished reports, keyed by content hash."""
+    return {}
+
+
+def _store_report(cache: dict, key: str, report: str) -> None:
+    """
+    Inserts a report into the cross-rerun store, keeping it bounded.
+
+    Expired entries are evicted on every insert, and the store is capped
+    at REPORT_CACHE_MAX_ENTRIES by dropping the oldest reports first.
+    """
+    now = time.time()
+
+    for stale in [k for k, (_, ts) in cache.items() if now - ts >= ANALYSIS_CACHE_TTL]:
+        del cache[stale]
+
+    while len(cache) >= REPORT_CACHE_MAX_ENTRIES:
+        del cache[min(cache, key=lambda k: cache[k][1])]
+
+    cache[key] = (report, now)
+
+
+def analyze_company(pages: List[Tuple[str, str]]) -> Iterator[str]:
+    """
+    Sends scraped company data to OpenAI for analysis.
+
+    Runs map-reduce: pages are first compressed via summarize_pages, then
+    one analysis call reasons over the small summary corpus. The final
+    response is streamed so the UI can render tokens as they arrive.
+
+    Args:
+        pages: List of (label, text) tuples from the company website
+
+    Yields:
+        Chunks of the analysis report (feed to st.write_stream)
+
     Raises:
         Exception: If OpenAI API call fails
     """
+    pages = truncate_to_token_budget(dedupe_pages(pages))
+    summaries = summarize_pages(pages)
+    corpus = "\n\n".join(
+        f"PAGE ({label}):\n{summary}"
+        for (label, _), summary in zip(pages, summaries)
+    )
+
     prompt = f"""
 You are a Senior Engineering Manager mentoring a student.
 Analyze the scraped company data to propose a 'Trojan Horse' internship project.
@@ -263,16 +515,18 @@ OUTPUT FORMAT:
    - List 2 specific search terms the student should Google to check if this feature already exists (e.g., "PostHog Slack Integration").
 
 DATA:
-{combined_text[:MAX_TOTAL_TEXT]}
+{corpus}
 """
     
     response = client.chat.completions.create(
         model="gpt-4o-mini",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.7,
+        stream=True,
     )
-    
-    return response.choices[0].message.content
+
+    for chunk in response:
+        yield chunk.choices[0].delta.content or ""
 
 
 # ============================================================================
@@ -320,7 +574,8 @@ if submitted:
                 st.error(f"❌ Could not access {url}. Please check the URL and try again.")
                 st.stop()
             
-            combined_text = f"HOME PAGE:\n{main_text}\n\n"
+            pages = [("HOME PAGE", main_text)]
+            total_chars = len(main_text)
             
             # Step 2: Find and scrape important links
             if soup:
@@ -331,22 +586,45 @@ if submitted:
                 
                 if important_links:
                     st.info(f"📚 Found {len(important_links)} additional pages to analyze")
-                    
-                    for i, link in enumerate(important_links):
-                        status.info(f"📖 Reading: {link}")
-                        progress_bar.progress(30 + (i + 1) * (40 // len(important_links)))
-                        
-                        time.sleep(SCRAPE_DELAY)  # Be respectful to servers
-                        
-                        sub_text, _ = scrape_page(link)
-                        if sub_text and not sub_text.startswith('['):
-                            combined_text += f"PAGE ({link}):\n{sub_text}\n\n"
+
+                    def on_progress(done: int, link: str) -> None:
+                        status.info(f"📖 Read: {link}")
+                        progress_bar.progress(30 + done * (40 // len(important_links)))
+
+                    # Fetch all sub-pages concurrently; the UI thread only
+                    # handles progress updates and the text budget
+                    for link, sub_text in scrape_links(important_links, on_progress):
+                        # Apply the total budget while collecting so we
+                        # never hold more text than we'll send
+                        if total_chars >= MAX_TOTAL_TEXT:
+                            break
+                        sub_text = sub_text[:MAX_TOTAL_TEXT - total_chars]
+                        pages.append((link, sub_text))
+                        total_chars += len(sub_text)
             
             # Step 3: AI Analysis
             status.info("🤖 Analyzing company data with AI...")
             progress_bar.progress(80)
             
-            report = analyze_company(combined_text)
+            # Reuse a recent report for identical scraped content - the API
+            # calls dominate cost and latency, so this makes resubmitting
+            # the same URL essentially free
+            cache = _report_cache()
+            cache_key = hashlib.sha256(
+                "".join(text for _, text in pages).encode()
+            ).hexdigest()
+            cached = cache.get(cache_key)
+
+            if cached and time.time() - cached[1] < ANALYSIS_CACHE_TTL:
+                report = cached[0]
+            else:
+                # Stream tokens as they arrive so the wait is
+                # time-to-first-token instead of the full generation
+                stream_area = st.empty()
+                with stream_area.container():
+                    report = st.write_stream(analyze_company(pages))
+                stream_area.empty()  # Final report renders in the results section
+                _store_report(cache, cache_key, report)
             
             # Save to session state
             st.session_state['report'] = report